@@ -7,6 +7,7 @@ import time
 import cv2  # pylint: disable=no-member
 import numpy as np
 import pymongo
+from gridfs import GridFS
 from pymongo.errors import PyMongoError
 from tensorflow.keras.models import load_model  # type: ignore  # pylint: disable=import-error,no-name-in-module
 from tensorflow.keras.preprocessing.image import img_to_array   # type: ignore  # pylint: disable=import-error,no-name-in-module
@@ -16,6 +17,7 @@ mongo_uri = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/containerap
 try:
     client = pymongo.MongoClient(mongo_uri)
     db = client.get_database()
+    fs = GridFS(db)
     client.admin.command("ping")
     print("Connected to MongoDB")
 except PyMongoError as e:
@@ -49,7 +51,10 @@ def process_pending_images():
             pending = db.images.find_one({"status": "pending"})
 
             if pending:
-                image_data = pending["image_data"]
+                if "file_id" in pending:
+                    image_data = fs.get(pending["file_id"]).read()
+                else:
+                    image_data = pending["image_data"]
 
                 nparr = np.frombuffer(image_data, np.uint8)
                 img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)  # pylint: disable=no-member
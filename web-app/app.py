@@ -9,36 +9,160 @@ making it accessible to visually impaired users or educational settings.
 """
 
 import base64
+import itertools
 import os
+from concurrent.futures import ThreadPoolExecutor
 import time
 import re
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple, Union
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Any, Set, Tuple, Union
 
+import orjson
 import pymongo
 import requests
 from dotenv import load_dotenv
+from gridfs import GridFS
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from flask import (
     Flask,
     jsonify,
-    render_template,
     request,
     Response,
+    stream_template,
 )
+from flask.json.provider import JSONProvider
+from pymongo import UpdateOne
 from pymongo.errors import PyMongoError
 from pymongo.database import Database
 from bson.objectid import ObjectId
 
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
 logger = logging.getLogger(__name__)
 
-MW_API_URL = os.getenv("MW_URL", "https://dictionaryapi.com/api/v3/references/collegiate/json")
+MW_API_URL = os.getenv(
+    "MW_URL", "https://dictionaryapi.com/api/v3/references/collegiate/json"
+)
 MW_API_KEY = os.getenv("MW_API_KEY")
 
+# get_definition() results that reflect a failed request rather than the word
+# itself; these are never persisted to the definitions collection.
+TRANSIENT_DEFINITION_ERRORS = (
+    "API key not configured.",
+    "API error",
+    "Network error",
+    "Error processing",
+)
+
+MW_MAX_WORKERS = 16
+# Cached definitions expire after a day via a TTL index on fetched_at.
+DEFINITION_TTL = 24 * 60 * 60
+
+FEED_LIMIT = 100
+# Feed entries read from the cursor at a time; uncached words in each batch are
+# fetched together before the batch is rendered.
+FEED_BATCH_SIZE = 20
+
+# Newest processed images joined with their cached definitions. "word" is the
+# first space-separated token of the top classification label.
+FEED_PIPELINE = [
+    {"$match": {"status": "processed"}},
+    {"$sort": {"processed_at": -1}},
+    {"$limit": FEED_LIMIT},
+    {"$project": {"image_data": 0, "definition": 0}},
+    {
+        "$addFields": {
+            "word": {
+                "$arrayElemAt": [
+                    {
+                        "$split": [
+                            {
+                                "$ifNull": [
+                                    {
+                                        "$arrayElemAt": [
+                                            {"$arrayElemAt": ["$classifications", 0]},
+                                            0,
+                                        ]
+                                    },
+                                    "",
+                                ]
+                            },
+                            " ",
+                        ]
+                    },
+                    0,
+                ]
+            }
+        }
+    },
+    {
+        "$lookup": {
+            "from": "definitions",
+            "localField": "word",
+            "foreignField": "_id",
+            "as": "def_doc",
+        }
+    },
+]
+
+# "uploading" placeholders are still being stored in the background; ones older
+# than UPLOAD_TIMEOUT seconds were lost with their worker and no longer count.
+UPLOAD_TIMEOUT = 120
+UPLOAD_WORKERS = 4
+# Uploads queued or in flight per process; each holds its full payload in memory.
+# Beyond this /upload answers 503, which also keeps the backlog well inside
+# UPLOAD_TIMEOUT.
+UPLOAD_QUEUE_SIZE = 16
+EVENTS_POLL_INTERVAL = 1
+# Each open /events stream holds a worker thread, so streams end after this many
+# polls and the browser reconnects after EVENTS_RETRY_MS.
+EVENTS_MAX_POLLS = 30
+EVENTS_RETRY_MS = 1000
+
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Upload types stored as-is; anything else (including scriptable SVG) is saved
+# and served as JPEG.
+IMAGE_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+DEFAULT_IMAGE_TYPE = "image/jpeg"
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_FIRST_WORD = re.compile(r"\s*([^\s\d]+)")
+_BRACED = re.compile(r"\{[^}]+\}")
+_OBJECT_ID = re.compile(r"[0-9a-fA-F]{24}")
+
+_UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+_UPLOAD_SLOTS = threading.BoundedSemaphore(UPLOAD_QUEUE_SIZE)
+
+# Shared keep-alive session so concurrent lookups reuse TLS connections to the MW API.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.1),
+    ),
+)
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for request parsing and jsonify()."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode()  # pylint: disable=no-member
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)  # pylint: disable=no-member
+
+
 load_dotenv()
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
 
 def setup_database() -> Optional[Database]:
     """Set up and return MongoDB database connection."""
@@ -46,79 +170,134 @@ def setup_database() -> Optional[Database]:
     if not mongo_uri:
         logger.error("MONGODB_URI environment variable not set")
         return None
-    
+
     try:
-        client = pymongo.MongoClient(mongo_uri)
+        client = pymongo.MongoClient(
+            mongo_uri,
+            maxPoolSize=50,
+            minPoolSize=5,
+            maxIdleTimeMS=60_000,
+            serverSelectionTimeoutMS=3000,
+            connectTimeoutMS=2000,
+            compressors="zstd,zlib",
+        )
         db = client.get_database()
-        client.admin.command("ping")
-        logger.info("Connected to MongoDB")
+        # Index creation doubles as the connectivity check; keep it off the import path.
+        threading.Thread(target=prepare_database, args=(db,), daemon=True).start()
         return db
     except PyMongoError as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
         return None
 
 
+def prepare_database(database: Database) -> None:
+    """Create indexes and clean up uploads orphaned by a previous worker."""
+    create_indexes(database)
+    fail_stale_uploads(database)
+
+
+def create_indexes(database: Database) -> None:
+    """Create the feed and pending-status indexes and the definition cache TTL."""
+    try:
+        # The status prefix also serves the pending-status count.
+        database.images.create_index([("status", 1), ("processed_at", -1)])
+        database.definitions.create_index(
+            "fetched_at", expireAfterSeconds=DEFINITION_TTL
+        )
+        logger.info("Connected to MongoDB")
+    except PyMongoError as e:
+        logger.error(f"Failed to create MongoDB indexes: {e}")
+
+
+def fail_stale_uploads(database: Database) -> None:
+    """Mark upload placeholders whose background store never finished as failed."""
+    try:
+        result = database.images.update_many(
+            {
+                "status": "uploading",
+                "timestamp": {"$lt": int(time.time()) - UPLOAD_TIMEOUT},
+            },
+            {"$set": {"status": "failed"}},
+        )
+        if result.modified_count:
+            logger.warning(f"Marked {result.modified_count} stale uploads as failed")
+    except PyMongoError as e:
+        logger.error(f"Failed to clean up stale uploads: {e}")
+
+
 db = setup_database()
+# GridFS bucket holding uploaded image bytes.
+fs = GridFS(db) if db is not None else None
+
+
+def image_content_type(mimetype: Optional[str]) -> str:
+    """Return the declared image type if it is safe to serve back, else JPEG."""
+    return mimetype if mimetype in IMAGE_CONTENT_TYPES else DEFAULT_IMAGE_TYPE
 
 
 def clean_name(name: str) -> str:
     """Extract the first word from the classification name and clean it."""
-    name = re.sub(r"\s*\d+\s*$", "", name)
-    return name.strip().split()[0]
+    match = _FIRST_WORD.match(name)
+    return match.group(1) if match else ""
 
 
 def parse_definition_text(text: str) -> Optional[str]:
     """Parse definition text and extract meaningful sentences."""
-    text = re.sub(r"\{[^}]+\}", "", text).strip()
-    sentences = [s.strip() for s in re.split(r"\.\s*", text) if s.strip()]
-    
-    if len(sentences) >= 2:
-        return sentences[1] + "."
-    elif sentences:
-        return sentences[0] + "."
+    text = _BRACED.sub("", text).strip()
+    sentences = []
+    start = 0
+
+    # Only the first two non-empty sentences matter, so stop scanning there.
+    while len(sentences) < 2 and start < len(text):
+        end = text.find(".", start)
+        if end < 0:
+            end = len(text)
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end + 1
+
+    if sentences:
+        return sentences[-1] + "."
     return None
 
 
-def extract_text_from_content(content: Union[str, List, Dict]) -> List[str]:
-    """Recursively extract text content from API response structures."""
-    parts = []
-    
-    if isinstance(content, str):
-        parts.append(content)
-    elif isinstance(content, list):
-        for item in content:
-            parts.extend(extract_text_from_content(item))
-    elif isinstance(content, dict) and "t" in content:
-        parts.append(content["t"])
-        
-    return parts
+def iter_text_from_content(content: Union[str, List, Dict]) -> Iterator[str]:
+    """Yield text content from API response structures, depth-first in document order."""
+    stack = [content]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            yield node
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict) and "t" in node:
+            yield node["t"]
 
 
 def extract_complete_definition(entry: Dict) -> str:
     """Extract a complete definition from the MW API response."""
     if not entry or "def" not in entry:
         return "No definition available."
-    
+
     for sense in entry.get("def", []):
         for group in sense.get("sseq", []):
             for sense_entry in group:
                 if not (isinstance(sense_entry, list) and len(sense_entry) >= 2):
                     continue
-                    
-                dt_items = sense_entry[1].get("dt", [])
-                all_text_parts = []
-                
-                for item in dt_items:
-                    if isinstance(item, list) and len(item) >= 2:
-                        content = item[1]
-                        all_text_parts.extend(extract_text_from_content(content))
-                
-                if all_text_parts:
-                    text = " ".join(all_text_parts)
+
+                for item in sense_entry[1].get("dt", []):
+                    if not (isinstance(item, list) and len(item) >= 2):
+                        continue
+
+                    text = " ".join(iter_text_from_content(item[1]))
+                    if len(text) < 3:
+                        continue
+
                     parsed_definition = parse_definition_text(text)
                     if parsed_definition:
                         return parsed_definition
-    
+
     return "No definition available."
 
 
@@ -129,25 +308,25 @@ def get_definition(word: str) -> str:
     if not MW_API_KEY:
         logger.error("MW_API_KEY not configured")
         return "API key not configured."
-    
+
     url = f"{MW_API_URL}/{word}?key={MW_API_KEY}"
-    
+
     try:
-        response = requests.get(url, timeout=5)
+        response = _SESSION.get(url, timeout=5)
         if response.status_code != 200:
             logger.warning(f"API error for word '{word}': {response.status_code}")
             return f"API error: {response.status_code}"
-            
+
         data = response.json()
         if not data or not isinstance(data, list):
             logger.info(f"No results found for word '{word}'")
             return "No results found."
-        
+
         first_entry = data[0]
         if not isinstance(first_entry, dict):
             logger.warning(f"Invalid API response format for word '{word}'")
             return "Invalid API response format."
-            
+
         return extract_complete_definition(first_entry)
     except requests.RequestException as e:
         logger.error(f"Request error when fetching definition for '{word}': {e}")
@@ -157,34 +336,78 @@ def get_definition(word: str) -> str:
         return "Error processing definition."
 
 
-def process_entry(entry: Dict) -> Dict:
+def lookup_definitions(words: Set[str]) -> Dict[str, str]:
+    """
+    Resolve definitions for a set of words, hitting the MW API only for words
+    not already cached in the definitions collection.
+    """
+    if not words:
+        return {}
+
+    definitions = {
+        doc["_id"]: doc["definition"]
+        for doc in db.definitions.find({"_id": {"$in": list(words)}})
+    }
+    missing = words - definitions.keys()
+    if not missing:
+        return definitions
+
+    with ThreadPoolExecutor(max_workers=min(MW_MAX_WORKERS, len(missing))) as executor:
+        fetched = dict(zip(missing, executor.map(get_definition, missing)))
+    definitions.update(fetched)
+
+    cacheable = {
+        word: definition
+        for word, definition in fetched.items()
+        if not definition.startswith(TRANSIENT_DEFINITION_ERRORS)
+    }
+    if not cacheable:
+        return definitions
+
+    now = datetime.now(timezone.utc)
+    cache_ops = [
+        UpdateOne(
+            {"_id": word},
+            {"$set": {"definition": definition, "fetched_at": now}},
+            upsert=True,
+        )
+        for word, definition in cacheable.items()
+    ]
+    try:
+        db.definitions.bulk_write(cache_ops, ordered=False)
+    except PyMongoError as e:
+        logger.error(f"Failed to cache definitions: {e}")
+
+    return definitions
+
+
+def process_entry(entry: Dict, definitions: Dict[str, str]) -> Dict:
     """Process and enhance an image classification entry."""
     classifications = entry.get("classifications", [])
-    
+
     if not classifications:
-        entry.update({
-            "top_class": "Unknown",
-            "definition": "No definition available.",
-            "confidence": "0%"
-        })
-        return entry
-    
-    top_class, conf = classifications[0]
-    clean_class = clean_name(top_class)
-    definition = get_definition(clean_class)
-    
-    if db is not None:
-        db.images.update_one(
-            {"_id": entry["_id"]},
-            {"$set": {"definition": definition}},
+        entry.update(
+            {
+                "top_class": "Unknown",
+                "definition": "No definition available.",
+                "confidence": "0%",
+            }
         )
-    
-    entry.update({
-        "top_class": clean_class,
-        "definition": definition,
-        "confidence": f"{conf * 100:.2f}%"
-    })
-    
+        return entry
+
+    # FEED_PIPELINE derives "word" server-side; definitions are keyed by it.
+    _top_class, conf = classifications[0]
+    word = entry["word"]
+    definition = definitions.get(word, "No definition available.")
+
+    entry.update(
+        {
+            "top_class": word,
+            "definition": definition,
+            "confidence": f"{conf * 100:.2f}%",
+        }
+    )
+
     return entry
 
 
@@ -200,10 +423,39 @@ def home():
     if db is None:
         logger.error("Database connection not available")
         return "Database connection error", 500
-        
-    processed_entries = db.images.find({"status": "processed"}).sort("processed_at", -1)
-    entries = [process_entry(entry) for entry in processed_entries]
-    return render_template("index.html", entries=entries)
+
+    entries = iter_feed_entries(db.images.aggregate(FEED_PIPELINE))
+    # The template branches on an empty feed, which a bare generator can't signal.
+    first_entry = next(entries, None)
+    entries = itertools.chain([first_entry], entries) if first_entry is not None else []
+    return Response(
+        stream_template("index.html", entries=entries), mimetype="text/html"
+    )
+
+
+def iter_feed_entries(cursor: Iterator[Dict]) -> Iterator[Dict]:
+    """
+    Yield feed entries as the cursor produces them, using joined definitions and
+    looking up each batch's uncached words together.
+    """
+    definitions: Dict[str, str] = {}
+    while True:
+        batch = list(itertools.islice(cursor, FEED_BATCH_SIZE))
+        if not batch:
+            return
+
+        for entry in batch:
+            if entry["def_doc"]:
+                definitions[entry["word"]] = entry["def_doc"][0]["definition"]
+        missing = {
+            entry["word"]
+            for entry in batch
+            if entry.get("classifications") and entry["word"] not in definitions
+        }
+        definitions.update(lookup_definitions(missing))
+
+        for entry in batch:
+            yield process_entry(entry, definitions)
 
 
 @app.route("/image/<image_id>")
@@ -211,14 +463,38 @@ def find_image(image_id: str):
     """Find and return an image from MongoDB by its ID."""
     if db is None:
         return "Database connection error", 500
-        
+
+    if not _OBJECT_ID.fullmatch(image_id):
+        return "Invalid image id", 400
+
+    # Image bytes never change once uploaded, so the id itself is a strong validator
+    # and revalidation can be answered without touching MongoDB.
+    cache_headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": f'"{image_id}"'}
+    # If-None-Match uses weak comparison, so accept W/ tags too. ETags.__contains__
+    # and contains() also treat "*" as a hit, which would 304 ids that don't exist.
+    if image_id in request.if_none_match.as_set(include_weak=True):
+        return Response(status=304, headers=cache_headers)
+
     try:
-        image_doc = db.images.find_one({"_id": ObjectId(image_id)})
+        image_doc = db.images.find_one(
+            {"_id": ObjectId(image_id)}, {"file_id": 1, "image_data": 1}
+        )
+        if image_doc and "file_id" in image_doc:
+            grid_out = fs.get(image_doc["file_id"])
+            return Response(
+                iter(lambda: grid_out.read(IMAGE_CHUNK_SIZE), b""),
+                mimetype=grid_out.content_type or DEFAULT_IMAGE_TYPE,
+                headers={"Content-Length": str(grid_out.length), **cache_headers},
+            )
         if image_doc and "image_data" in image_doc:
-            return Response(image_doc["image_data"], mimetype="image/jpeg")
+            return Response(
+                image_doc["image_data"],
+                mimetype=DEFAULT_IMAGE_TYPE,
+                headers=cache_headers,
+            )
         return "Image not found", 404
-    except Exception as e:
-        print(f"Error serving image: {e}")
+    except Exception:
+        logger.exception(f"Error serving image {image_id}")
         return "Error serving image", 500
 
 
@@ -227,9 +503,48 @@ def check_status():
     """Check if there are any pending images and return status."""
     if db is None:
         return jsonify({"error": "Database connection error"}), 500
-        
-    pending_count = db.images.count_documents({"status": "pending"})
-    return jsonify({"pending": pending_count > 0})
+
+    return jsonify({"pending": has_pending_images()})
+
+
+@app.route("/events")
+def pending_events():
+    """
+    Stream pending status as Server-Sent Events, ending once nothing is pending
+    or after EVENTS_MAX_POLLS polls.
+    """
+    if db is None:
+        return jsonify({"error": "Database connection error"}), 500
+
+    def generate() -> Iterator[str]:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        for _ in range(EVENTS_MAX_POLLS):
+            pending = has_pending_images()
+            yield f"data: {app.json.dumps({'pending': pending})}\n\n"
+            if not pending:
+                return
+            time.sleep(EVENTS_POLL_INTERVAL)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def has_pending_images() -> bool:
+    """Check whether any image is still uploading or awaiting classification."""
+    pending_filter = {
+        "$or": [
+            {"status": "pending"},
+            {
+                "status": "uploading",
+                "timestamp": {"$gte": int(time.time()) - UPLOAD_TIMEOUT},
+            },
+        ]
+    }
+    # limit=1 lets MongoDB stop at the first match; only existence matters here.
+    return db.images.count_documents(pending_filter, limit=1) > 0
 
 
 @app.route("/upload", methods=["POST"])
@@ -238,45 +553,101 @@ def upload():
     if db is None:
         logger.error("Database connection not available during upload")
         return jsonify({"success": False, "message": "Database connection error"}), 500
-        
+
     data = request.get_json()
     if not data or "image" not in data:
         logger.warning("Upload attempt with no image data")
         return jsonify({"success": False, "message": "No image data provided"}), 400
-        
+
     try:
-        _header, encoded = data["image"].split(",", 1)
+        header, encoded = data["image"].split(",", 1)
     except (TypeError, KeyError, ValueError) as e:
         logger.warning(f"Invalid image data format: {e}")
         return jsonify({"success": False, "message": "Invalid image data"}), 400
 
-    try:
-        binary = base64.b64decode(encoded)
-    except Exception as e:
-        logger.error(f"Failed to decode base64 image: {e}")
-        return jsonify({"success": False, "message": "Invalid image encoding"}), 400
-        
+    # Data URI header: "data:image/jpeg;base64"
+    mimetype = header.partition(":")[2].partition(";")[0]
+    return queue_upload(encoded, image_content_type(mimetype))
+
+
+@app.route("/upload_raw", methods=["POST"])
+def upload_raw():
+    """Store an image posted as the raw request body, skipping base64 and JSON."""
+    if db is None:
+        logger.error("Database connection not available during upload")
+        return jsonify({"success": False, "message": "Database connection error"}), 500
+
+    binary = request.get_data(cache=False)
+    if not binary:
+        logger.warning("Upload attempt with no image data")
+        return jsonify({"success": False, "message": "No image data provided"}), 400
+
+    return queue_upload(binary, image_content_type(request.mimetype))
+
+
+def queue_upload(payload: Union[str, bytes], content_type: str):
+    """Record a placeholder image document and finish storing it in the background."""
     timestamp = int(time.time())
     formatted_time = datetime.fromtimestamp(timestamp).strftime("%I:%M %p")
-    
+    image_id = ObjectId()
+
+    if not _UPLOAD_SLOTS.acquire(blocking=False):
+        logger.warning("Upload queue full; rejecting upload")
+        return jsonify({"success": False, "message": "Server busy, try again"}), 503
+
     try:
-        image_doc = {
-            "timestamp": timestamp,
-            "formatted_time": formatted_time,
-            "image_data": binary,
-            "status": "pending",
-        }
-        result = db.images.insert_one(image_doc)
-        logger.info(f"Image uploaded successfully. ID: {result.inserted_id}")
-        return jsonify({
-            "success": True,
-            "message": "Image uploaded successfully and is being processed.",
-            "image_id": str(result.inserted_id),
-        })
+        db.images.insert_one(
+            {
+                "_id": image_id,
+                "timestamp": timestamp,
+                "formatted_time": formatted_time,
+                "status": "uploading",
+            }
+        )
     except pymongo.errors.PyMongoError as e:
+        _UPLOAD_SLOTS.release()
         logger.error(f"Error storing image in MongoDB: {e}")
         return jsonify({"success": False, "message": "Database error"}), 500
 
+    _UPLOAD_EXECUTOR.submit(store_image, image_id, payload, content_type)
+    logger.info(f"Image upload queued. ID: {image_id}")
+    return (
+        jsonify(
+            {
+                "success": True,
+                "message": "Image uploaded successfully and is being processed.",
+                "image_id": str(image_id),
+            }
+        ),
+        202,
+    )
+
+
+def store_image(
+    image_id: ObjectId, payload: Union[str, bytes], content_type: str
+) -> None:
+    """
+    Save an upload to GridFS and mark it pending for the ML client, then free its
+    queue slot. A str payload is base64 text from /upload; bytes are already the
+    raw image.
+    """
+    try:
+        binary = base64.b64decode(payload) if isinstance(payload, str) else payload
+        file_id = fs.put(binary, content_type=content_type)
+        db.images.update_one(
+            {"_id": image_id},
+            {"$set": {"file_id": file_id, "status": "pending"}},
+        )
+        logger.info(f"Image uploaded successfully. ID: {image_id}")
+    except Exception:
+        logger.exception(f"Failed to store image {image_id}")
+        try:
+            db.images.update_one({"_id": image_id}, {"$set": {"status": "failed"}})
+        except PyMongoError as e:
+            logger.error(f"Failed to mark image {image_id} as failed: {e}")
+    finally:
+        _UPLOAD_SLOTS.release()
+
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5001, debug=True)
@@ -3,12 +3,51 @@
 import os
 import sys
 import pytest
+from concurrent.futures import Executor, Future
+from unittest import mock
+
 import mongomock
+from mongomock.collection import BulkOperationBuilder
 from flask import Flask
+from gridfs import GridFS
+from pymongo.collection import Collection
+from pymongo.database import Database
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from app import app as flask_app
 
+# mongomock 4.1.2 predates the ``sort`` argument pymongo 4.12 passes to bulk
+# update ops; drop it so bulk_write() works against the mock database.
+_mongomock_add_update = BulkOperationBuilder.add_update
+
+
+def _add_update_without_sort(self, *args, sort=None, **kwargs):
+    return _mongomock_add_update(self, *args, **kwargs)
+
+
+BulkOperationBuilder.add_update = _add_update_without_sort
+
+# mongomock.gridfs.enable_gridfs_integration() patches the pre-4.9 gridfs
+# module layout; apply the same isinstance patches to gridfs.synchronous.
+mock.patch(
+    "gridfs.synchronous.grid_file.Database", (Database, mongomock.Database)
+).start()
+mock.patch(
+    "gridfs.synchronous.grid_file.Collection", (Collection, mongomock.Collection)
+).start()
+
+
+class ImmediateExecutor(Executor):
+    """Executor that runs submitted work inline so tests see its effects at once"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:  # pylint: disable=broad-except
+            future.set_exception(e)
+        return future
+
 
 @pytest.fixture
 def app():
@@ -26,12 +65,19 @@ def app():
 
     original_client = getattr(app, "client", None)
     original_db = getattr(app, "db", None)
+    original_executor = app._UPLOAD_EXECUTOR
+    original_fs = app.fs
 
     app.client = mock_client
     app.db = mock_db
+    app.fs = GridFS(mock_db)
+    app._UPLOAD_EXECUTOR = ImmediateExecutor()
 
     yield flask_app
 
+    app._UPLOAD_EXECUTOR = original_executor
+    app.fs = original_fs
+
     if original_client is not None:
         app.client = original_client
     if original_db is not None:
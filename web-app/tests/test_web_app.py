@@ -6,6 +6,7 @@ import pytest
 from flask import Flask
 from app import app
 
+
 class Tests:
     """Test cases for the web app"""
 
@@ -22,7 +23,6 @@ class Tests:
     #     assert response.status_code == 302
     #     assert response.headers["Location"] == "/"
 
-
     def test_upload_route_exists(self, client):
         """Test that the upload route exists (as a POST endpoint)"""
 
@@ -30,7 +30,7 @@ class Tests:
         dummy_image = f"data:image/jpeg;base64,{dummy_data}"
 
         response = client.post("/upload", json={"image": dummy_image})
-        assert response.status_code in [200, 302, 400]
+        assert response.status_code in [200, 202, 302, 400]
 
     def test_static_directory_exists(self, app):
         """Test that the static directory exists"""
@@ -38,8 +38,8 @@ class Tests:
 
     def test_upload_missing_image_data(self, client):
         """Test to see if invalid input is caight properly"""
-        response = client.post("/upload", json={}) 
-        assert response.status_code == 400 or response.status_code == 500 
+        response = client.post("/upload", json={})
+        assert response.status_code == 400 or response.status_code == 500
 
     def test_uploaded_image_stored_in_mongo(self, client, app):
         """Test to see if the image is stored in mongodb to be identified"""
@@ -49,19 +49,24 @@ class Tests:
         client.post("/upload", json={"image": dummy_image})
 
         from app import db
+
         result = list(db.images.find().sort("timestamp", -1).limit(1))
         assert result
         assert result[0]["status"] == "pending"
-    
+
     def test_home_handles_empty_data(self, client):
         """Home page still works when there are no images"""
         response = client.get("/")
         assert response.status_code == 200
-        assert b"No processed images" in response.data or b"Object Gallery" in response.data
+        assert (
+            b"No processed images" in response.data
+            or b"Object Gallery" in response.data
+        )
 
     def test_get_definition_valid_word(self):
         """Checks to see if definitions are being provided"""
         from app import get_definition
+
         result = get_definition("python")
         assert isinstance(result, str)
         assert len(result) > 0
@@ -69,18 +74,402 @@ class Tests:
     def test_get_definition_invalid_word(self):
         """Checks to see how a random word that does not exist is being handled by the function"""
         from app import get_definition
+
         result = get_definition("asdfghjklqwerty")
         assert result == "No definition available."
 
+    def test_home_fetches_each_word_once(self, client, monkeypatch):
+        """Repeated classes share one lookup and cached words skip the API"""
+        import app as web_app
+
+        fetched = []
+
+        def fake_get_definition(word):
+            fetched.append(word)
+            return f"A {word}."
 
+        monkeypatch.setattr(web_app, "get_definition", fake_get_definition)
+        web_app.db.definitions.insert_one({"_id": "Banana", "definition": "A banana."})
+        web_app.db.images.insert_many(
+            [
+                {
+                    "status": "processed",
+                    "processed_at": 1,
+                    "classifications": [["Apple 10", 0.9]],
+                },
+                {
+                    "status": "processed",
+                    "processed_at": 2,
+                    "classifications": [["Apple Red 1", 0.8]],
+                },
+                {
+                    "status": "processed",
+                    "processed_at": 3,
+                    "classifications": [["Banana 1", 0.7]],
+                },
+            ]
+        )
 
+        response = client.get("/")
+        assert response.status_code == 200
+        assert fetched == ["Apple"]
+        assert (
+            web_app.db.definitions.find_one({"_id": "Apple"})["definition"]
+            == "A Apple."
+        )
+        assert b"A banana." in response.data
+
+    def test_clean_name_strips_variant_suffix(self):
+        """Classification labels reduce to their first word"""
+        from app import clean_name
+
+        assert clean_name("Apple 10") == "Apple"
+        assert clean_name("Apple Red Delicious 1") == "Apple"
+        assert clean_name("Banana") == "Banana"
+        assert clean_name("Apple2x 1") == "Apple"
+        assert clean_name("") == ""
+
+    def test_parse_definition_text(self):
+        """Markup is stripped and the second sentence is preferred"""
+        from app import parse_definition_text
+
+        assert (
+            parse_definition_text("{bc}a fruit. The edible pome. Other.")
+            == "The edible pome."
+        )
+        assert (
+            parse_definition_text("{bc}the fruit of a tree") == "the fruit of a tree."
+        )
+        assert parse_definition_text("{bc}") is None
+
+    def test_extract_complete_definition_nested_dt(self):
+        """The first dt item that parses to a sentence wins"""
+        from app import extract_complete_definition
+
+        entry = {
+            "def": [
+                {
+                    "sseq": [
+                        [
+                            [
+                                "sense",
+                                {
+                                    "dt": [
+                                        [
+                                            "text",
+                                            "{bc}the fleshy fruit. It grows on trees",
+                                        ],
+                                        ["vis", [{"t": "an {it}apple{/it} a day"}]],
+                                    ]
+                                },
+                            ]
+                        ]
+                    ]
+                }
+            ]
+        }
+        assert extract_complete_definition(entry) == "It grows on trees."
+        entry["def"][0]["sseq"][0][0][1]["dt"][0] = ["text", "{bc}"]
+        assert extract_complete_definition(entry) == "an apple a day."
+        assert extract_complete_definition({}) == "No definition available."
+
+    def test_uploaded_image_stored_in_gridfs(self, client):
+        """Image bytes live in GridFS and are served back by /image/<id>"""
+        dummy_image = "data:image/jpeg;base64," + base64.b64encode(
+            b"jpeg-bytes"
+        ).decode("utf-8")
+
+        response = client.post("/upload", json={"image": dummy_image})
+        image_id = response.get_json()["image_id"]
+
+        from app import db
+
+        image_doc = db.images.find_one()
+        assert "image_data" not in image_doc
+        assert "file_id" in image_doc
+
+        response = client.get(f"/image/{image_id}")
+        assert response.status_code == 200
+        assert response.data == b"jpeg-bytes"
+
+    def test_image_served_with_cache_headers(self, client):
+        """Images are cacheable and revalidate to 304 with a matching ETag"""
+        dummy_image = "data:image/jpeg;base64," + base64.b64encode(
+            b"x" * 100000
+        ).decode("utf-8")
+        image_id = client.post("/upload", json={"image": dummy_image}).get_json()[
+            "image_id"
+        ]
+
+        response = client.get(f"/image/{image_id}")
+        assert response.status_code == 200
+        assert response.data == b"x" * 100000
+        assert response.headers["Content-Length"] == "100000"
+        assert "immutable" in response.headers["Cache-Control"]
+
+        cached = client.get(
+            f"/image/{image_id}", headers={"If-None-Match": response.headers["ETag"]}
+        )
+        assert cached.status_code == 304
+        assert cached.data == b""
+
+    def test_image_revalidation_skips_database(self, client, monkeypatch):
+        """A matching If-None-Match is answered before any MongoDB lookup"""
+        import app as web_app
+
+        def fail_find_one(*args, **kwargs):
+            raise AssertionError("unexpected MongoDB lookup")
+
+        monkeypatch.setattr(web_app.db.images, "find_one", fail_find_one)
+        image_id = "0123456789abcdef01234567"
+        response = client.get(
+            f"/image/{image_id}", headers={"If-None-Match": f'"{image_id}"'}
+        )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == f'"{image_id}"'
+
+    def test_image_weak_if_none_match_revalidates(self, client):
+        """A weak validator for the image id still earns a 304"""
+        image_id = "0123456789abcdef01234567"
+        response = client.get(
+            f"/image/{image_id}", headers={"If-None-Match": f'W/"{image_id}"'}
+        )
+        assert response.status_code == 304
+
+    def test_image_wildcard_if_none_match_is_not_cached(self, client):
+        """If-None-Match: * does not turn a missing image into a 304"""
+        response = client.get(
+            "/image/0123456789abcdef01234567", headers={"If-None-Match": "*"}
+        )
+        assert response.status_code == 404
+
+    def test_image_rejects_malformed_id(self, client):
+        """Ids that cannot be ObjectIds are rejected before any lookup"""
+        assert client.get("/image/not-an-id").status_code == 400
+        assert client.get("/image/0123456789abcdef01234567").status_code == 404
+
+    def test_upload_raw_stores_body_bytes(self, client):
+        """Raw JPEG bodies are stored without base64 wrapping"""
+        response = client.post(
+            "/upload_raw", data=b"raw-jpeg", content_type="image/jpeg"
+        )
+        assert response.status_code == 202
+        image_id = response.get_json()["image_id"]
+
+        from app import db
 
+        assert db.images.find_one()["status"] == "pending"
+        assert client.get(f"/image/{image_id}").data == b"raw-jpeg"
 
+        assert (
+            client.post("/upload_raw", data=b"", content_type="image/jpeg").status_code
+            == 400
+        )
 
+    def test_home_joins_cached_definitions(self, client, monkeypatch):
+        """Cached definitions are joined server-side and images are not rewritten"""
+        import app as web_app
 
+        def fail_get_definition(word):
+            raise AssertionError(f"unexpected API lookup for {word}")
+
+        monkeypatch.setattr(web_app, "get_definition", fail_get_definition)
+        web_app.db.definitions.insert_one(
+            {"_id": "Lemon", "definition": "A sour citrus fruit."}
+        )
+        web_app.db.images.insert_one(
+            {
+                "status": "processed",
+                "processed_at": 1,
+                "classifications": [["Lemon 1", 0.9]],
+            }
+        )
+
+        response = client.get("/")
+        assert b"A sour citrus fruit." in response.data
+        assert "definition" not in web_app.db.images.find_one()
+
+    def test_status_reports_pending(self, client):
+        """/status flips to pending once an upload is queued"""
+        assert client.get("/status").get_json() == {"pending": False}
+        client.post("/upload_raw", data=b"raw-jpeg", content_type="image/jpeg")
+        response = client.get("/status")
+        assert response.mimetype == "application/json"
+        assert response.get_json() == {"pending": True}
+
+    def test_upload_accepted_before_storage(self, client, monkeypatch):
+        """Uploads return 202 with a placeholder and finish in the background"""
+        import app as web_app
+
+        queued = []
+        monkeypatch.setattr(
+            web_app._UPLOAD_EXECUTOR, "submit", lambda *args: queued.append(args)
+        )
+
+        response = client.post(
+            "/upload_raw", data=b"raw-jpeg", content_type="image/jpeg"
+        )
+        assert response.status_code == 202
+        image_doc = web_app.db.images.find_one()
+        assert str(image_doc["_id"]) == response.get_json()["image_id"]
+        assert image_doc["status"] == "uploading"
+        assert client.get("/status").get_json() == {"pending": True}
+
+        web_app.store_image(*queued[0][1:])
+        assert web_app.db.images.find_one()["status"] == "pending"
+
+    def test_upload_with_bad_encoding_marked_failed(self, client):
+        """A payload that fails to decode is not left pending forever"""
+        response = client.post("/upload", json={"image": "data:image/jpeg;base64,abc"})
+        assert response.status_code == 202
+
+        from app import db
+
+        assert db.images.find_one()["status"] == "failed"
+        assert client.get("/status").get_json() == {"pending": False}
+
+    def test_events_stream_ends_when_nothing_pending(self, client):
+        """/events reports the pending state and closes once idle"""
+        response = client.get("/events")
+        assert response.mimetype == "text/event-stream"
+        assert response.data == b'retry: 1000\n\ndata: {"pending":false}\n\n'
+
+    def test_events_stream_is_capped_while_pending(self, client, monkeypatch):
+        """/events gives its thread back after EVENTS_MAX_POLLS even if work is pending"""
+        import app as web_app
+
+        monkeypatch.setattr(web_app, "EVENTS_MAX_POLLS", 3)
+        monkeypatch.setattr(web_app, "EVENTS_POLL_INTERVAL", 0)
+        web_app.db.images.insert_one({"status": "pending"})
+
+        response = client.get("/events")
+        assert response.data.count(b'data: {"pending":true}') == 3
+
+    def test_orphaned_upload_does_not_stay_pending(self, client):
+        """A placeholder whose background store never finished stops counting as pending"""
+        import time
+        import app as web_app
+
+        web_app.db.images.insert_one(
+            {
+                "status": "uploading",
+                "timestamp": int(time.time()) - web_app.UPLOAD_TIMEOUT - 1,
+            }
+        )
+        assert client.get("/status").get_json() == {"pending": False}
+
+        web_app.fail_stale_uploads(web_app.db)
+        assert web_app.db.images.find_one()["status"] == "failed"
+
+    def test_home_streams_empty_feed(self, client):
+        """An empty feed is streamed and renders the no-results branch"""
+        response = client.get("/")
+        assert response.is_streamed
+        assert b"No processed images found" in response.data
+        assert b"Classification Results" not in response.data
+
+    def test_home_streams_feed_in_batches(self, client, monkeypatch):
+        """Entries across several cursor batches all render with their definitions"""
+        import app as web_app
+
+        lookups = []
+
+        def fake_get_definition(word):
+            lookups.append(word)
+            return f"A {word}."
+
+        monkeypatch.setattr(web_app, "get_definition", fake_get_definition)
+        monkeypatch.setattr(web_app, "FEED_BATCH_SIZE", 2)
+        web_app.db.images.insert_many(
+            [
+                {
+                    "status": "processed",
+                    "processed_at": i,
+                    "classifications": [[label, 0.9]],
+                }
+                for i, label in enumerate(
+                    ["Kiwi 1", "Kiwi 2", "Mango 1", "Kiwi 3", "Pear 1"]
+                )
+            ]
+        )
+
+        response = client.get("/")
+        assert response.is_streamed
+        assert b"Classification Results" in response.data
+        for definition in (b"A Kiwi.", b"A Mango.", b"A Pear."):
+            assert definition in response.data
+        assert sorted(lookups) == ["Kiwi", "Mango", "Pear"]
+
+    def test_json_provider_is_orjson(self, app, client):
+        """JSON goes through orjson, and malformed bodies still fail as 400"""
+        from app import ORJSONProvider
+
+        assert isinstance(app.json, ORJSONProvider)
+        response = client.post(
+            "/upload", data=b"{not json", content_type="application/json"
+        )
+        assert response.status_code == 400
+
+    def test_cached_definitions_expire_after_a_day(self, client, monkeypatch):
+        """Definitions carry a BSON date that a TTL index expires after one day"""
+        from datetime import datetime
+        import app as web_app
+
+        monkeypatch.setattr(web_app, "get_definition", lambda word: f"A {word}.")
+        web_app.lookup_definitions({"Plum"})
+        assert isinstance(
+            web_app.db.definitions.find_one({"_id": "Plum"})["fetched_at"], datetime
+        )
+
+        web_app.create_indexes(web_app.db)
+        ttl_index = web_app.db.definitions.index_information()["fetched_at_1"]
+        assert ttl_index["expireAfterSeconds"] == 24 * 60 * 60
+
+    def test_home_defines_entries_by_pipeline_word(self, client, monkeypatch):
+        """The word the feed pipeline joins on is the one the entry renders with"""
+        import app as web_app
+
+        monkeypatch.setattr(web_app, "get_definition", lambda word: f"A {word}.")
+        web_app.db.images.insert_one(
+            {
+                "status": "processed",
+                "processed_at": 1,
+                "classifications": [["Apple2x 1", 0.9]],
+            }
+        )
+
+        response = client.get("/")
+        assert b"A Apple2x." in response.data
+        assert b"No definition available." not in response.data
 
+    def test_upload_rejected_when_queue_full(self, client, monkeypatch):
+        """A full upload queue answers 503 without leaving a placeholder behind"""
+        import threading
+        import app as web_app
 
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        monkeypatch.setattr(web_app, "_UPLOAD_SLOTS", slots)
 
+        response = client.post(
+            "/upload_raw", data=b"raw-jpeg", content_type="image/jpeg"
+        )
+        assert response.status_code == 503
+        assert web_app.db.images.count_documents({}) == 0
 
+        slots.release()
+        response = client.post(
+            "/upload_raw", data=b"raw-jpeg", content_type="image/jpeg"
+        )
+        assert response.status_code == 202
+        assert slots.acquire(blocking=False)
 
+    def test_image_served_with_uploaded_content_type(self, client):
+        """GridFS keeps the upload's image type and unsafe types fall back to JPEG"""
+        png = client.post("/upload_raw", data=b"png-bytes", content_type="image/png")
+        response = client.get(f"/image/{png.get_json()['image_id']}")
+        assert response.mimetype == "image/png"
 
+        html = client.post("/upload_raw", data=b"<script>", content_type="text/html")
+        response = client.get(f"/image/{html.get_json()['image_id']}")
+        assert response.mimetype == "image/jpeg"